@@ -1,5 +1,10 @@
 # Required imports for application functionality
 import os
+import re
+import atexit
+import shutil
+import time
+import tempfile
 import openai
 import streamlit as st
 from streamlit_option_menu import option_menu
@@ -10,6 +15,10 @@ from bs4 import BeautifulSoup
 from urllib.parse import urlparse, parse_qs
 import io
 from fpdf import FPDF
+from content_store import ContentStore
+from math_render import MathRenderCache, split_math_segments, fit_math_image
+from question_bank import QuestionBank, split_quiz_questions, compose_quiz
+import matplotlib
 import docx
 import pandas as pd
 import pytesseract
@@ -19,9 +28,13 @@ from sympy import simplify, latex
 
 # Configure Streamlit page settings - MUST BE FIRST!
 st.set_page_config(page_title="QuizGenius", page_icon="🧠", layout="wide")
+RUN_STARTED = time.perf_counter()
 
-# Add MathJax support for mathematical notation
-st.markdown("""
+# Static HTML/CSS blocks, gathered into constants so the page code stays short.
+# app.py still runs top to bottom on every full rerun, so st.markdown() sends
+# these again each time; only fragment reruns skip them.
+# MathJax support for mathematical notation
+MATHJAX_SCRIPT = """
     <script type="text/javascript">
         window.MathJax = {
             tex: {
@@ -37,7 +50,139 @@ st.markdown("""
     <script type="text/javascript" id="MathJax-script" async
         src="https://cdn.jsdelivr.net/npm/mathjax@3/es5/tex-svg.js">
     </script>
-""", unsafe_allow_html=True)
+"""
+
+# Styling for the first-time warning page
+WARNING_CSS = """
+    <style>
+    .warning-header {
+        color: white;
+        text-align: center;
+        padding: 20px;
+        margin-bottom: 20px;
+    }
+    .warning-section {
+        background-color: #f8f9fa;
+        padding: 20px;
+        border-radius: 10px;
+        margin-bottom: 15px;
+        border-left: 4px solid #ff4b4b;
+        color: white;
+    }
+    </style>
+    """
+
+# CSS for API button styling to match logo color
+API_BUTTON_CSS = """
+    <style>
+    [data-testid="stButton"][aria-label="api_button"] {
+        font-size: 12px;
+        background-color: #FBCD5D;
+        border: none;
+        border-radius: 4px;
+        color: white;
+    }
+    </style>
+    """
+
+# Custom CSS styling for the app
+APP_CSS = """
+    <style>
+    /* Global text styles */
+    .stMarkdown {
+        font-family: 'Helvetica Neue', sans-serif;
+        color: white;
+    }
+    
+    /* Headers */
+    h1 {
+        color: white;
+        font-weight: 600;
+    }
+    
+    h2, h3 {
+        color: white;
+        font-weight: 500;
+    }
+    
+    /* Buttons */
+    .stButton>button {
+        background-color: #FBCD5D;
+        color: white;
+        border-radius: 5px;
+        padding: 0.5rem 1rem;
+        font-weight: 500;
+    }
+    
+    /* Sidebar */
+    .css-1d391kg {
+        padding: 2rem 1rem;
+    }
+    
+    /* Cards/Boxes */
+    .stExpander {
+        background-color: #f8f9fa;
+        border-radius: 10px;
+        border: 1px solid #e9ecef;
+        color: white;
+    }
+    
+    /* Tabs */
+    .stTabs [data-baseweb="tab-list"] {
+        gap: 24px;
+    }
+    
+    .stTabs [data-baseweb="tab"] {
+        height: 50px;
+        white-space: pre-wrap;
+        background-color: transparent;
+        border-radius: 4px;
+        color: white;
+        font-size: 16px;
+    }
+    
+    /* Info boxes */
+    .stAlert {
+        padding: 1rem;
+        border-radius: 8px;
+    }
+    </style>
+    """
+
+# Read image files once per process and serve the cached bytes on reruns
+@st.cache_data
+def load_static_image(path):
+    with open(path, 'rb') as f:
+        return f.read()
+
+# Record how long a full run or fragment run took for this session.
+# Set QUIZGENIUS_PROFILE_RERUNS=1 to also print the timings to the server log.
+def record_rerun_cost(scope, started):
+    elapsed_ms = (time.perf_counter() - started) * 1000
+    st.session_state.setdefault('rerun_costs', {})[scope] = elapsed_ms
+    if os.environ.get('QUIZGENIUS_PROFILE_RERUNS') == '1':
+        print(f"[rerun] {scope}: {elapsed_ms:.1f} ms")
+
+# Add MathJax support for mathematical notation
+st.markdown(MATHJAX_SCRIPT, unsafe_allow_html=True)
+
+# Create the content store once per process and share it across sessions
+@st.cache_resource
+def get_content_store():
+    budget_mb = float(os.environ.get('QUIZGENIUS_CONTENT_BUDGET_MB', '256'))
+    disk_budget_mb = float(os.environ.get('QUIZGENIUS_SPILL_BUDGET_MB', '1024'))
+    spill_dir = os.environ.get('QUIZGENIUS_SPILL_DIR')
+    if spill_dir:
+        os.makedirs(spill_dir, exist_ok=True)
+    else:
+        # Private temporary directory, removed when the process exits
+        spill_dir = tempfile.mkdtemp(prefix='quizgenius-content-')
+        atexit.register(shutil.rmtree, spill_dir, ignore_errors=True)
+    compress = os.environ.get('QUIZGENIUS_COMPRESS_CONTENT', '1') != '0'
+    return ContentStore(int(budget_mb * 1024 * 1024), spill_dir, compress, int(disk_budget_mb * 1024 * 1024))
+
+# Prefix of the message detect_subject_area returns when the API call fails
+SUBJECT_DETECTION_ERROR = "Error detecting subject"
 
 # Function to detect subject area from text using OpenAI API
 def detect_subject_area(text):
@@ -87,11 +232,12 @@ Interdisciplinary Connections:
         # Call OpenAI API
         response = openai.ChatCompletion.create(
             model="gpt-4o-mini",
-            messages=messages
+            messages=messages,
+            api_key=st.session_state.get('api_key')
         )
         return response.choices[0].message.content
     except Exception as e:
-        return f"Error detecting subject: {str(e)}"
+        return f"{SUBJECT_DETECTION_ERROR}: {str(e)}"
 
 # Function to suggest quiz format based on content using OpenAI API
 def suggest_quiz_format(text):
@@ -161,7 +307,8 @@ Content:
         # Call OpenAI API
         response = openai.ChatCompletion.create(
             model="gpt-4o-mini",
-            messages=messages
+            messages=messages,
+            api_key=st.session_state.get('api_key')
         )
         return response.choices[0].message.content
     except Exception as e:
@@ -170,8 +317,8 @@ Content:
 # Initialize session state variables for app functionality
 if 'accepted_terms' not in st.session_state:
     st.session_state.accepted_terms = False
-if 'website_contents' not in st.session_state:
-    st.session_state.website_contents = []
+if 'source_ref' not in st.session_state:
+    st.session_state.source_ref = None
 if 'show_config' not in st.session_state:
     st.session_state.show_config = False
 if 'quiz_generated' not in st.session_state:
@@ -188,27 +335,14 @@ if 'format_suggestion' not in st.session_state:
     st.session_state.format_suggestion = None
 if 'url_processed' not in st.session_state:
     st.session_state.url_processed = False
+if 'bank_served' not in st.session_state:
+    st.session_state.bank_served = 0
+if 'quiz_shortfall' not in st.session_state:
+    st.session_state.quiz_shortfall = 0
 
 # Display warning page for first-time users
 if not st.session_state.accepted_terms:
-    st.markdown("""
-        <style>
-        .warning-header {
-            color: white;
-            text-align: center;
-            padding: 20px;
-            margin-bottom: 20px;
-        }
-        .warning-section {
-            background-color: #f8f9fa;
-            padding: 20px;
-            border-radius: 10px;
-            margin-bottom: 15px;
-            border-left: 4px solid #ff4b4b;
-            color: white;
-        }
-        </style>
-        """, unsafe_allow_html=True)
+    st.markdown(WARNING_CSS, unsafe_allow_html=True)
     
     st.markdown("<h1 class='warning-header'>⚠️ Important Warnings and Guidelines</h1>", unsafe_allow_html=True)
     
@@ -252,57 +386,58 @@ if not st.session_state.accepted_terms:
     """)
     st.markdown("</div>", unsafe_allow_html=True)
     
-    agree = st.checkbox("I have read and agree to the above warnings and guidelines")
-    if st.button("Continue to QuizGenius", disabled=not agree):
+    agree = st.checkbox("I have read and agree to the above warnings and guidelines", key='agree_terms')
+    if st.button("Continue to QuizGenius", disabled=not agree, key='continue_terms'):
         st.session_state.accepted_terms = True
         st.rerun()
     
     st.stop()
 
 # Set up sidebar with API key input and navigation
-with st.sidebar:
-    st.image('images/QuizGenius.png')
+# API key input runs as a fragment so typing the key doesn't rerun the page
+@st.fragment
+def api_key_input():
+    started = time.perf_counter()
     
     # Row 1: Label
-    st.write('Enter OpenAI API token:', style={'color': 'white'})
+    st.write('Enter OpenAI API token:')
     
     # Row 2: Input box and button in columns
     col1, col2 = st.columns([5,1], gap="small")
     with col1:
-        openai.api_key = st.text_input('', type='password', label_visibility="collapsed")
+        # Kept per session in st.session_state['api_key'], never in the shared openai.api_key
+        api_key = st.text_input('OpenAI API token', type='password', label_visibility="collapsed", key='api_key')
     with col2:
         check_api = st.button('▶', key='api_button')
         
-        # Updated CSS for button styling to match logo color
-        st.markdown("""
-            <style>
-            [data-testid="stButton"][aria-label="api_button"] {
-                font-size: 12px;
-                background-color: #FBCD5D;
-                border: none;
-                border-radius: 4px;
-                color: white;
-            }
-            </style>
-            """, unsafe_allow_html=True)
+        st.markdown(API_BUTTON_CSS, unsafe_allow_html=True)
     
     if check_api:
-        if not openai.api_key:
+        if not api_key:
             st.warning('Please enter your OpenAI API token!', icon='⚠️')
-        elif not openai.api_key.startswith('sk-'):
+        elif not api_key.startswith('sk-'):
             st.warning('API key should start with "sk-"!', icon='⚠️')
-        elif len(openai.api_key) < 100:  # Adjusted length check
+        elif len(api_key) < 100:  # Adjusted length check
             st.warning('API key appears to be too short. Please check your key!', icon='⚠️')
         else:
             st.success('Proceed to generating your quiz!', icon='👉')
     
-    # Navigation menu
+    record_rerun_cost('api_key_input', started)
+
+with st.sidebar:
+    st.image(load_static_image('images/QuizGenius.png'))
+    
+    api_key_input()
+    
+    # Navigation menu, optionally opened on a page given as ?page=<name>
+    pages = ["Home", "Quiz Generator"]
+    requested_page = st.query_params.get('page')
     options = option_menu(
         "Dashboard", 
-        ["Home", "Quiz Generator"],
+        pages,
         icons = ['house', 'book'],
         menu_icon = "list", 
-        default_index = 0,
+        default_index = pages.index(requested_page) if requested_page in pages else 0,
         styles = {
             "icon": {"color": "#FBCD5D", "font-size": "20px"},
             "nav-link": {"font-size": "17px", "text-align": "left", "margin": "5px", "--hover-color": "#262730", "color": "white"},
@@ -395,167 +530,302 @@ Time Limit: 30 minutes
    Therefore, the answer is A.
 """
 
-# Function to format quiz content for PDF using OpenAI API
-def format_quiz_for_pdf(quiz_text):
-    messages = [
-        {"role": "system", "content": """
-Role: PDF Formatting Specialist for Educational Content
-
-Task: Convert quiz content into print-ready format while preserving mathematical notation and structure.
-
-Instructions:
-1. Maintain clear section organization:
-   - Time limit at the top
-   - Questions numbered clearly
-   - Multiple choice options indented
-   - Solutions clearly marked
-   
-2. Format Mathematical Expressions:
-   - Convert LaTeX to readable print format
-   - Example: $\\frac{x}{y}$ → (x)/(y)
-   - Example: $x^{2}$ → x^(2)
-   - Example: $\\sqrt{x}$ → √(x)
-   - Example: $\\cdot$ → ×
-   - Example: $3 \\times 10^{8}$ → 3 × 10^(8)
-   
-3. Formatting Rules:
-   - Use clear section breaks
-   - Indent multiple choice options
-   - Preserve question numbering
-   - Mark solutions distinctly
-   - Maintain consistent spacing
-   - Ensure all special characters are PDF-safe
-   
-4. Output Structure:
-   Time Limit: [time]
-   
-   Question 1:
-   [Question text]
-   A) [option]
-   B) [option]
-   C) [option]
-   D) [option]
-   
-   Solution:
-   [Step-by-step solution]
-   
-   [Repeat for each question]
-
-5. Character Constraints:
-   - Use only ASCII characters
-   - Replace special symbols with print-safe alternatives
-   - Maintain mathematical meaning while ensuring printability
-"""},
-        {"role": "user", "content": f"Convert this quiz content into print-ready format: \n\n{quiz_text}"}
-    ]
-    
-    try:
-        response = openai.ChatCompletion.create(
-            model="gpt-4o-mini",
-            messages=messages
-        )
-        return response.choices[0].message.content
-    except Exception as e:
-        print(f"Error formatting quiz for PDF: {str(e)}")
-        return quiz_text
-
-# Simplified PDF creation function that relies on the OpenAI formatting
+# Create the math render cache once per process and share it across sessions
+@st.cache_resource
+def get_math_render_cache():
+    return MathRenderCache()
+
+# Unicode TTF fonts shipped with matplotlib, used instead of the Latin-1 core fonts
+PDF_FONT_DIR = os.path.join(matplotlib.get_data_path(), 'fonts', 'ttf')
+PDF_FONTS = {'': 'DejaVuSans.ttf', 'B': 'DejaVuSans-Bold.ttf', 'I': 'DejaVuSans-Oblique.ttf'}
+
+# Write one line of quiz text, embedding rendered math images inline
+def write_math_line(pdf, line, math_cache, line_height=8):
+    segments = split_math_segments(line)
+    # Display math may use the full printable width; inline math also leaves
+    # room for the c_margin offset below
+    rendered = [fit_math_image(math_cache.render(value), pdf.epw if kind == 'display' else pdf.epw - pdf.c_margin)
+                if kind != 'text' else None for kind, value in segments]
+    # Grow the line to fit tall expressions such as fractions
+    row_height = max([line_height] + [image[2] + 1 for image in rendered if image])
+
+    if pdf.get_y() + row_height > pdf.page_break_trigger:
+        pdf.add_page()
+    for (kind, value), image in zip(segments, rendered):
+        if kind == 'text':
+            pdf.write(row_height, value)
+        elif image is None:
+            # Fall back to the raw LaTeX source if mathtext can't render it
+            pdf.write(row_height, value)
+        elif kind == 'display':
+            png, width, height = image
+            if pdf.get_x() > pdf.l_margin:
+                pdf.ln(row_height)
+            if pdf.get_y() + height + 2 > pdf.page_break_trigger:
+                pdf.add_page()
+            pdf.image(io.BytesIO(png), x=(pdf.w - width) / 2, y=pdf.get_y() + 1, w=width, h=height)
+            pdf.ln(height + 2)
+        else:
+            png, width, height = image
+            if pdf.get_x() + pdf.c_margin + width > pdf.w - pdf.r_margin:
+                pdf.ln(row_height)
+                if pdf.get_y() + row_height > pdf.page_break_trigger:
+                    pdf.add_page()
+            # write() draws text c_margin right of the cursor, so offset images the same way
+            pdf.image(io.BytesIO(png), x=pdf.get_x() + pdf.c_margin, y=pdf.get_y() + (row_height - height) / 2,
+                      w=width, h=height)
+            pdf.set_x(pdf.get_x() + width)
+    if pdf.get_x() > pdf.l_margin:
+        pdf.ln(row_height)
+
+# PDF creation function that renders LaTeX math directly from the quiz text
 def create_formatted_pdf(quiz_text):
-    # Get formatted content from OpenAI
-    formatted_content = format_quiz_for_pdf(quiz_text)
-    
     class PDF(FPDF):
         def header(self):
-            self.set_font('Arial', 'B', 15)
-            self.cell(0, 10, 'Practice Quiz', 0, 1, 'C')
+            self.set_font('QuizSans', 'B', 15)
+            self.cell(0, 10, 'Practice Quiz', align='C', new_x='LMARGIN', new_y='NEXT')
             self.ln(5)
         
         def footer(self):
             self.set_y(-15)
-            self.set_font('Arial', 'I', 8)
-            self.cell(0, 10, f'Page {self.page_no()}', 0, 0, 'C')
-    
-    pdf = PDF()
-    pdf.add_page()
-    pdf.set_font('Arial', size=11)
-    pdf.set_auto_page_break(auto=True, margin=15)
-    
-    # Simply write the OpenAI-formatted content
-    for line in formatted_content.split('\n'):
-        if line.strip():
-            pdf.multi_cell(0, 8, txt=line)
-            if "Question" in line or "Solution:" in line:
-                pdf.ln(3)  # Extra space after question/solution headers
+            self.set_font('QuizSans', 'I', 8)
+            self.cell(0, 10, f'Page {self.page_no()}', align='C')
+    
+    math_cache = get_math_render_cache()
+    # Collapse display math that spans several lines onto a single line
+    quiz_text = re.sub(r'\$\$(.+?)\$\$', lambda m: '$$' + ' '.join(m.group(1).split()) + '$$',
+                       quiz_text, flags=re.S)
     
     try:
-        return pdf.output(dest='S').encode('latin-1')
+        pdf = PDF()
+        for style, font_file in PDF_FONTS.items():
+            pdf.add_font('QuizSans', style, os.path.join(PDF_FONT_DIR, font_file))
+        pdf.set_auto_page_break(auto=True, margin=15)
+        pdf.add_page()
+        
+        for line in quiz_text.split('\n'):
+            if not line.strip():
+                continue
+            # Markdown headings become bold lines; inline bold markers are dropped
+            heading = line.lstrip().startswith('#')
+            line = re.sub(r'\*\*(.+?)\*\*', r'\1', line.lstrip('# ') if heading else line)
+            pdf.set_font('QuizSans', 'B' if heading else '', 11)
+            write_math_line(pdf, line, math_cache)
+            if "Question" in line or "Solution:" in line:
+                pdf.ln(3)  # Extra space after question/solution headers
+        
+        return bytes(pdf.output())
     except Exception as e:
         print(f"PDF generation error: {str(e)}")
         return None
 
+# Open the question bank once per process and share it across sessions
+@st.cache_resource
+def get_question_bank():
+    return QuestionBank(os.environ.get('QUIZGENIUS_QUESTION_BANK', 'question_bank.db'))
+
 # Add custom CSS styling for the app
-st.markdown("""
-    <style>
-    /* Global text styles */
-    .stMarkdown {
-        font-family: 'Helvetica Neue', sans-serif;
-        color: white;
-    }
-    
-    /* Headers */
-    h1 {
-        color: white;
-        font-weight: 600;
-    }
-    
-    h2, h3 {
-        color: white;
-        font-weight: 500;
-    }
+st.markdown(APP_CSS, unsafe_allow_html=True)
+
+# Upper bound on model calls for one quiz, and on the size of the
+# "do not repeat" list sent with each of them
+MAX_GENERATION_ROUNDS = 10
+AVOID_LIST_CHARS = 8000
+
+# Ask the model for `count` new questions, listing existing ones to avoid repeats.
+# The most recent questions are listed first, as many as fit in AVOID_LIST_CHARS.
+def request_quiz_questions(count, difficulty, question_type, specific_topics, existing):
+    source_excerpt = get_content_store().get(st.session_state.source_ref, limit=4000)
+    avoid_lines = []
+    used = 0
+    for question in reversed(existing):
+        line = f"- {question.splitlines()[0][:100]}"
+        used += len(line) + 1
+        if used > AVOID_LIST_CHARS:
+            break
+        avoid_lines.append(line)
+    avoid = "\n".join(avoid_lines)
+    if avoid:
+        avoid = "Do not repeat or closely paraphrase these existing questions:\n" + avoid
+    user_message = f"""Based on the following content: {source_excerpt}... (truncated)
+    Please generate {count} {question_type} questions at {difficulty} level.
+    {"Focus on these topics: " + specific_topics if specific_topics else ""}
+    {avoid}
+    Calculate and include appropriate time limit based on question types and difficulty.
+    Please format each question with clear A, B, C, D options for multiple choice, or step-by-step solutions for problem solving."""
+
+    struct = [{"role": "system", "content": System_Prompt}]
+    struct.append({"role": "user", "content": user_message})
+    chat = openai.ChatCompletion.create(
+        model="gpt-4o-mini",
+        messages=struct,
+        api_key=st.session_state.get('api_key')
+    )
+    return chat.choices[0].message.content
+
+# Quiz Generator steps run as fragments: editing a URL or a configuration
+# widget only reruns its own step, and st.rerun() inside a step still
+# reruns the whole app to move on to the next step.
+@st.fragment
+def url_input_step():
+    started = time.perf_counter()
+    
+    # Step 1: Get URLs
+    st.subheader("Enter up to 5 URLs for content")
+    
+    # Create input fields for up to 5 URLs
+    urls = []
+    for i in range(5):
+        col1, col2 = st.columns([5,1], gap="small")
+        with col1:
+            url = st.text_input(f"URL {i+1}:", key=f"url_{i}")
+            if url:
+                urls.append(url)
+    
+    process_urls = st.button('Process URLs', key='process_urls')
+
+    if process_urls and urls:
+        try:
+            with st.spinner('Processing URL content...'):
+                # Process each URL
+                website_contents = []
+                for url in urls:
+                    try:
+                        response = requests.get(url)
+                        soup = BeautifulSoup(response.text, 'html.parser')
+                        content = " ".join([p.get_text() for p in soup.find_all('p')])
+                        website_contents.append(content)
+                    except Exception as e:
+                        st.error(f"Error processing URL {url}: {str(e)}")
     
-    /* Buttons */
-    .stButton>button {
-        background-color: #FBCD5D;
-        color: white;
-        border-radius: 5px;
-        padding: 0.5rem 1rem;
-        font-weight: 500;
-    }
+                if website_contents:
+                    # Combine all contents once and keep only a reference in the session
+                    combined_content = " ".join(website_contents)
+                    st.session_state.source_ref = get_content_store().put(combined_content)
     
-    /* Sidebar */
-    .css-1d391kg {
-        padding: 2rem 1rem;
-    }
+                    # Steps 2 & 3: Detect subject and suggest format
+                    st.session_state.detected_subject = detect_subject_area(combined_content)
+                    st.session_state.format_suggestion = suggest_quiz_format(combined_content)
     
-    /* Cards/Boxes */
-    .stExpander {
-        background-color: #f8f9fa;
-        border-radius: 10px;
-        border: 1px solid #e9ecef;
-        color: white;
-    }
+                    st.session_state.url_processed = True
+                    st.rerun()
+                else:
+                    st.error("No content could be extracted from the provided URLs.")
+        except Exception as e:
+            st.error(f"Error processing URLs: {str(e)}")
+
+    record_rerun_cost('url_input_step', started)
+
+@st.fragment
+def quiz_configuration_step():
+    started = time.perf_counter()
     
-    /* Tabs */
-    .stTabs [data-baseweb="tab-list"] {
-        gap: 24px;
-    }
+    # Step 4: Quiz configuration (no loading here)
+    st.subheader("Quiz Configuration")
     
-    .stTabs [data-baseweb="tab"] {
-        height: 50px;
-        white-space: pre-wrap;
-        background-color: transparent;
-        border-radius: 4px;
-        color: white;
-        font-size: 16px;
-    }
+    col1, col2, col3 = st.columns(3)
+    with col1:
+        difficulty = st.selectbox("Difficulty Level:", ["Beginner", "Intermediate", "Advanced"], key='difficulty')
+    with col2:
+        question_type = st.selectbox("Question Type:", 
+                                   ["Multiple Choice", "Problem Solving", "Essay", "Mixed"],
+                                   help="Mixed will create a balanced combination of different question types",
+                                   key='question_type')
+    with col3:
+        num_questions = st.number_input("Number of Questions:", 
+                                      min_value=1, 
+                                      max_value=100, 
+                                      value=5,
+                                      help="Choose between 1-100 questions",
+                                      key='num_questions')
+
+    specific_topics = st.text_area("Quiz Context and Focus Areas:",
+                help="Help us understand your goals! What's the purpose of this quiz? Any specific topics or concepts you want to focus on?",
+                placeholder="Example: 'Preparing for midterm exam, focus on chapters 3-4' or 'Weekly practice quiz for calculus class, emphasize derivatives'",
+                height=100,
+                key='specific_topics')
+
+    # Step 5: Generate quiz only when button is clicked
+    if st.button("Generate Quiz", key='generate_quiz'):
+        with st.spinner('Generating your quiz...'):
+            # Fill from the question bank first and ask the model only for the rest
+            bank = get_question_bank()
+            detected_subject = st.session_state.detected_subject
+            if detected_subject and detected_subject.startswith(SUBJECT_DETECTION_ERROR):
+                detected_subject = None
+            bank_key = (st.session_state.source_ref, bank.source_subject(st.session_state.source_ref, detected_subject),
+                        difficulty, question_type, specific_topics.strip().lower())
+            questions = bank.fetch(*bank_key, limit=num_questions)
+            st.session_state.bank_served = len(questions)
+            st.session_state.quiz_shortfall = 0
+            
+            if len(questions) < num_questions and not st.session_state.get('api_key'):
+                st.error("Please enter your OpenAI API key first!")
+                st.stop()
     
-    /* Info boxes */
-    .stAlert {
-        padding: 1rem;
-        border-radius: 8px;
-    }
-    </style>
-    """, unsafe_allow_html=True)
+            try:
+                quiz_text = None
+                # Near-duplicates are dropped, so keep asking for the shortfall
+                # until the quiz is full or a round brings no new questions
+                for _ in range(MAX_GENERATION_ROUNDS):
+                    missing = num_questions - len(questions)
+                    if missing <= 0:
+                        break
+                    generated_text = request_quiz_questions(missing, difficulty, question_type, specific_topics, questions)
+                    generated = split_quiz_questions(generated_text)
+                    if not generated and not questions:
+                        # Unrecognised layout: show the model output as is and skip the bank
+                        quiz_text = generated_text
+                        break
+                    kept = bank.add(*bank_key, generated, existing=questions)[:missing]
+                    if not kept:
+                        break
+                    questions += kept
+                if not quiz_text:
+                    st.session_state.quiz_shortfall = num_questions - len(questions)
+                st.session_state.quiz_text = quiz_text or compose_quiz(questions, difficulty, question_type)
+                # Generate PDF data immediately after quiz generation
+                st.session_state.pdf_data = create_formatted_pdf(st.session_state.quiz_text)
+                st.session_state.quiz_generated = True
+                st.rerun()
+            except KeyError:
+                # The source bundle was evicted from the content store's disk budget
+                st.error("The source content is no longer available. Please start a new quiz and process the URLs again.")
+            except Exception as e:
+                st.error(f"An error occurred: {str(e)}")
+
+    record_rerun_cost('quiz_configuration_step', started)
+
+# Download and reset buttons, kept apart from the (possibly long) quiz render
+@st.fragment
+def quiz_actions():
+    started = time.perf_counter()
+    
+    # Create two columns for the buttons
+    left_col, right_col = st.columns(2)
+    
+    with left_col:
+        if st.session_state.pdf_data is not None:
+            st.download_button(
+                label="📥 Download Quiz (PDF)",
+                data=st.session_state.pdf_data,
+                file_name="quiz.pdf",
+                mime="application/pdf",
+                key="download_pdf"
+            )
+            math_cache = get_math_render_cache()
+            st.caption(f"Math render cache: {math_cache.hits} hits, {math_cache.misses} misses "
+                       f"({math_cache.hit_rate():.0%} hit rate)")
+    
+    with right_col:
+        if st.button("🔄 Generate New Quiz", key="new_quiz"):
+            st.session_state.url_processed = False
+            st.session_state.quiz_generated = False
+            st.session_state.quiz_text = None
+            st.session_state.pdf_data = None
+            st.rerun()
+
+    record_rerun_cost('quiz_actions', started)
 
 # Options : Home
 if options == "Home":
@@ -612,55 +882,18 @@ elif options == "Quiz Generator":
     st.title("Quiz Generator")
     
     if not st.session_state.url_processed:
-        # Step 1: Get URLs
-        st.subheader("Enter up to 5 URLs for content")
-        
-        # Create input fields for up to 5 URLs
-        urls = []
-        for i in range(5):
-            col1, col2 = st.columns([5,1], gap="small")
-            with col1:
-                url = st.text_input(f"URL {i+1}:", key=f"url_{i}")
-                if url:
-                    urls.append(url)
-            
-        process_urls = st.button('Process URLs', key='process_urls')
-
-        if process_urls and urls:
-            try:
-                with st.spinner('Processing URL content...'):
-                    # Clear previous contents
-                    st.session_state.website_contents = []
-                    
-                    # Process each URL
-                    for url in urls:
-                        try:
-                            response = requests.get(url)
-                            soup = BeautifulSoup(response.text, 'html.parser')
-                            content = " ".join([p.get_text() for p in soup.find_all('p')])
-                            st.session_state.website_contents.append(content)
-                        except Exception as e:
-                            st.error(f"Error processing URL {url}: {str(e)}")
-                    
-                    if st.session_state.website_contents:
-                        # Combine all contents for subject detection and format suggestion
-                        combined_content = " ".join(st.session_state.website_contents)
-                        
-                        # Steps 2 & 3: Detect subject and suggest format
-                        st.session_state.detected_subject = detect_subject_area(combined_content)
-                        st.session_state.format_suggestion = suggest_quiz_format(combined_content)
-                        
-                        st.session_state.url_processed = True
-                        st.rerun()
-                    else:
-                        st.error("No content could be extracted from the provided URLs.")
-            except Exception as e:
-                st.error(f"Error processing URLs: {str(e)}")
+        url_input_step()
 
     else:
         if st.session_state.quiz_text:
             # Display generated quiz and buttons
             st.subheader("Generated Quiz:")
+            if st.session_state.bank_served:
+                st.caption(f"{st.session_state.bank_served} question(s) served from the question bank")
+            if st.session_state.quiz_shortfall:
+                st.warning(f"This quiz has {st.session_state.quiz_shortfall} question(s) fewer than requested: "
+                           "the model stopped producing new questions that aren't near-duplicates. "
+                           "Try broadening the focus areas or adding more source URLs.", icon='⚠️')
             st.markdown(st.session_state.quiz_text)
             
             # Generate PDF data if it doesn't exist
@@ -669,26 +902,7 @@ elif options == "Quiz Generator":
             
             st.markdown("---")
             
-            # Create two columns for the buttons
-            left_col, right_col = st.columns(2)
-            
-            with left_col:
-                if st.session_state.pdf_data is not None:
-                    st.download_button(
-                        label="📥 Download Quiz (PDF)",
-                        data=st.session_state.pdf_data,
-                        file_name="quiz.pdf",
-                        mime="application/pdf",
-                        key="download_pdf"
-                    )
-            
-            with right_col:
-                if st.button("🔄 Generate New Quiz", key="new_quiz"):
-                    st.session_state.url_processed = False
-                    st.session_state.quiz_generated = False
-                    st.session_state.quiz_text = None
-                    st.session_state.pdf_data = None
-                    st.rerun()
+            quiz_actions()
 
         else:
             # Display stored subject detection and suggestions
@@ -696,56 +910,6 @@ elif options == "Quiz Generator":
             if st.session_state.format_suggestion:
                 st.info(st.session_state.format_suggestion)
 
-            # Step 4: Quiz configuration (no loading here)
-            st.subheader("Quiz Configuration")
-            
-            col1, col2, col3 = st.columns(3)
-            with col1:
-                difficulty = st.selectbox("Difficulty Level:", ["Beginner", "Intermediate", "Advanced"], key='difficulty')
-            with col2:
-                question_type = st.selectbox("Question Type:", 
-                                           ["Multiple Choice", "Problem Solving", "Essay", "Mixed"],
-                                           help="Mixed will create a balanced combination of different question types",
-                                           key='question_type')
-            with col3:
-                num_questions = st.number_input("Number of Questions:", 
-                                              min_value=1, 
-                                              max_value=100, 
-                                              value=5,
-                                              help="Choose between 1-100 questions",
-                                              key='num_questions')
-
-            specific_topics = st.text_area("Quiz Context and Focus Areas:",
-                        help="Help us understand your goals! What's the purpose of this quiz? Any specific topics or concepts you want to focus on?",
-                        placeholder="Example: 'Preparing for midterm exam, focus on chapters 3-4' or 'Weekly practice quiz for calculus class, emphasize derivatives'",
-                        height=100,
-                        key='specific_topics')
-
-            # Step 5: Generate quiz only when button is clicked
-            if st.button("Generate Quiz"):
-                if not openai.api_key:
-                    st.error("Please enter your OpenAI API key first!")
-                    st.stop()
-
-                with st.spinner('Generating your quiz...'):
-                    user_message = f"""Based on the following content: {' '.join(st.session_state.website_contents)[:4000]}... (truncated)
-                    Please generate {num_questions} {question_type} questions at {difficulty} level.
-                    {"Focus on these topics: " + specific_topics if specific_topics else ""}
-                    Calculate and include appropriate time limit based on question types and difficulty.
-                    Please format each question with clear A, B, C, D options for multiple choice, or step-by-step solutions for problem solving."""
-
-                    struct = [{"role": "system", "content": System_Prompt}]
-                    struct.append({"role": "user", "content": user_message})
-                    
-                    try:
-                        chat = openai.ChatCompletion.create(
-                            model="gpt-4o-mini",
-                            messages=struct
-                        )
-                        st.session_state.quiz_text = chat.choices[0].message.content
-                        # Generate PDF data immediately after quiz generation
-                        st.session_state.pdf_data = create_formatted_pdf(st.session_state.quiz_text)
-                        st.session_state.quiz_generated = True
-                        st.rerun()
-                    except Exception as e:
-                        st.error(f"An error occurred: {str(e)}")
+            quiz_configuration_step()
+
+record_rerun_cost('app', RUN_STARTED)
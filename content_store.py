@@ -0,0 +1,111 @@
+# Content store for QuizGenius: source text shared by every session in the
+# process, deduplicated by hash, spilled to disk past a memory budget. Kept
+# apart from app.py so it can be imported and tested without running the
+# Streamlit page.
+import os
+import zlib
+import hashlib
+import threading
+from collections import OrderedDict
+
+# Process-wide store for source content, shared by every browser session.
+# Bundles are deduplicated by content hash and kept (optionally compressed)
+# in memory up to a byte budget; least recently used bundles spill to disk,
+# and the oldest spill files are deleted once the disk budget is exceeded.
+# Sessions only hold the hash returned by put().
+class ContentStore:
+    def __init__(self, memory_budget, spill_dir, compress=True, disk_budget=1024 ** 3):
+        self.memory_budget = memory_budget
+        self.disk_budget = disk_budget
+        self.spill_dir = spill_dir
+        self.compress = compress
+        self._memory = OrderedDict()  # ref -> stored bytes, oldest first
+        self._memory_bytes = 0
+        self._spilled = OrderedDict()  # ref -> spill file size, oldest first
+        self._spilled_bytes = 0
+        self._lock = threading.Lock()
+
+    def _spill_path(self, ref):
+        return os.path.join(self.spill_dir, ref + ('.z' if self.compress else '.txt'))
+
+    # Move least recently used bundles to disk until under the memory budget
+    def _spill_over_budget(self):
+        while self._memory and self._memory_bytes > self.memory_budget:
+            ref, data = self._memory.popitem(last=False)
+            self._memory_bytes -= len(data)
+            path = self._spill_path(ref)
+            tmp_path = f"{path}.{threading.get_ident()}.tmp"
+            with open(tmp_path, 'wb') as f:
+                f.write(data)
+            os.replace(tmp_path, path)
+            self._spilled[ref] = len(data)
+            self._spilled_bytes += len(data)
+        self._evict_over_disk_budget()
+
+    # Delete least recently used spill files until under the disk budget
+    def _evict_over_disk_budget(self):
+        while self._spilled and self._spilled_bytes > self.disk_budget:
+            ref, size = self._spilled.popitem(last=False)
+            self._spilled_bytes -= size
+            try:
+                os.remove(self._spill_path(ref))
+            except FileNotFoundError:
+                pass
+
+    # Store text once and return its content hash as the session reference
+    def put(self, text):
+        data = text.encode('utf-8')
+        ref = hashlib.sha256(data).hexdigest()
+        with self._lock:
+            if ref in self._memory:
+                self._memory.move_to_end(ref)
+                return ref
+            if ref in self._spilled:
+                self._spilled.move_to_end(ref)
+                return ref
+            if os.path.exists(self._spill_path(ref)):
+                # Already spilled by another replica sharing the spill directory
+                size = os.path.getsize(self._spill_path(ref))
+                self._spilled[ref] = size
+                self._spilled_bytes += size
+                self._evict_over_disk_budget()
+                return ref
+            if self.compress:
+                data = zlib.compress(data)
+            self._memory[ref] = data
+            self._memory_bytes += len(data)
+            self._spill_over_budget()
+        return ref
+
+    # Return the stored text, or only its first `limit` characters.
+    # Raises KeyError if the bundle was evicted from disk.
+    def get(self, ref, limit=None):
+        with self._lock:
+            data = self._memory.get(ref)
+            if data is not None:
+                self._memory.move_to_end(ref)
+            elif ref in self._spilled:
+                self._spilled.move_to_end(ref)
+        if data is None:
+            try:
+                with open(self._spill_path(ref), 'rb') as f:
+                    data = f.read()
+            except FileNotFoundError:
+                raise KeyError(ref)
+        # A UTF-8 character is at most 4 bytes, so limit * 4 bytes always
+        # covers the requested prefix without materialising the whole bundle
+        max_bytes = None if limit is None else limit * 4
+        if self.compress:
+            data = zlib.decompressobj().decompress(data, max_bytes or 0)
+        elif max_bytes is not None:
+            data = data[:max_bytes]
+        return data.decode('utf-8', errors='ignore')[:limit]
+
+    def stats(self):
+        with self._lock:
+            return {
+                'memory_entries': len(self._memory),
+                'memory_bytes': self._memory_bytes,
+                'spilled_entries': len(self._spilled),
+                'spilled_bytes': self._spilled_bytes,
+            }
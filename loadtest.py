@@ -0,0 +1,547 @@
+# Multi-session load test for QuizGenius
+#
+# Drives simulated teacher sessions through the real app.py flow (accept
+# terms, enter API key and URLs, process, configure, generate, download)
+# against a local mock OpenAI API and a local mock web server. Each replica
+# is a separate `streamlit run` server process; every session talks to it
+# over Streamlit's websocket protocol the way a browser tab does, so
+# sessions in one replica run app.py concurrently on the server's script
+# threads and share its process-wide caches. The download step fetches the
+# PDF from the server's media endpoint over HTTP.
+#
+# By default every replica at every level starts with an empty question
+# bank, so levels are comparable and each one pays for its own generation;
+# only repeated sources within a level are served from the bank. Warmup
+# sessions use their own sources so they never fill the measured bank keys.
+# --warm-bank instead shares one bank across all replicas and levels,
+# which measures the steady state once the bank is populated.
+#
+# Examples:
+#   python loadtest.py --sessions 20 --concurrency 4
+#   python loadtest.py --sessions 40 --concurrency 1,2,4,8,16 --replicas 2
+#   python loadtest.py --concurrency 8 --save-baseline baseline.json
+#   python loadtest.py --concurrency 8 --baseline baseline.json --tolerance 0.2
+#   QUIZGENIUS_PROFILE_RERUNS=1 python loadtest.py --questions 100 --edits 20
+import argparse
+import json
+import math
+import os
+import random
+import re
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from streamlit.proto.Alert_pb2 import Alert
+from streamlit.proto.BackMsg_pb2 import BackMsg
+from streamlit.proto.ForwardMsg_pb2 import ForwardMsg
+from streamlit.proto.WidgetStates_pb2 import WidgetState
+from websockets.sync.client import connect
+
+APP_DIR = os.path.dirname(os.path.abspath(__file__))
+STEPS = ['accept_terms', 'enter_urls', 'process', 'configure', 'generate', 'download', 'edit']
+
+# Filler used to build mock page paragraphs
+LOREM = ("The derivative of a function measures how its output changes as its input changes. "
+         "For $f(x) = x^{2}$ the derivative is $2x$, and integrals reverse this process. ")
+
+# Words mixed into mock questions so they aren't near-duplicates of each other
+VOCABULARY = ("slope tangent curve rate velocity area volume limit series sequence chain product "
+              "quotient power exponential logarithm sine cosine polynomial root maximum minimum "
+              "inflection concavity approximation interval continuity asymptote parabola circle").split()
+
+# Local stand-in for the OpenAI chat completions endpoint
+class MockOpenAIHandler(BaseHTTPRequestHandler):
+    latency = 0.0
+
+    def do_POST(self):
+        body = json.loads(self.rfile.read(int(self.headers.get('Content-Length', 0))) or b'{}')
+        messages = body.get('messages', [])
+        system = messages[0]['content'] if messages else ''
+        user = messages[-1]['content'] if messages else ''
+        if self.latency:
+            time.sleep(self.latency)
+        payload = {
+            'id': 'chatcmpl-mock',
+            'object': 'chat.completion',
+            'created': int(time.time()),
+            'model': body.get('model', 'gpt-4o-mini'),
+            'choices': [{
+                'index': 0,
+                'message': {'role': 'assistant', 'content': mock_completion(system, user)},
+                'finish_reason': 'stop',
+            }],
+            'usage': {'prompt_tokens': 0, 'completion_tokens': 0, 'total_tokens': 0},
+        }
+        data = json.dumps(payload).encode('utf-8')
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, format, *args):
+        pass
+
+# Canned answers keyed on the role described in the system prompt
+def mock_completion(system, user):
+    if 'Subject Matter Expert' in system:
+        return "Primary Subject: Mathematics\nSub-discipline: Calculus\nConfidence Level: High"
+    if 'Educational Assessment Expert' in system:
+        return "Recommended Format:\nPrimary Format: Multiple Choice\nAlternative Format: Problem Solving"
+    match = re.search(r'generate (\d+)', user)
+    count = int(match.group(1)) if match else 5
+    questions = []
+    for i in range(1, count + 1):
+        context = " ".join(random.sample(VOCABULARY, 8))
+        questions.append(
+            f"{i}. Question: Considering {context}, what is the derivative of $f(x) = x^{{{i + 1}}} + {i}x$?\n\n"
+            f"   A) ${i + 1}x^{{{i}}} + {i}$\n   B) $x^{{{i}}}$\n   C) ${i}x$\n   D) $0$\n\n"
+            f"   Solution:\n   Step 1: $\\frac{{d}}{{dx}}(x^{{{i + 1}}}) = {i + 1}x^{{{i}}}$\n"
+            f"   Therefore, the answer is A."
+        )
+    return f"Time Limit: {count * 2} minutes\n\n" + "\n\n".join(questions)
+
+# Local stand-in for the educational web pages being scraped
+class MockWebHandler(BaseHTTPRequestHandler):
+    page_bytes = 8 * 1024
+
+    def do_GET(self):
+        paragraph = f"<p>{self.path} {LOREM}</p>"
+        repeats = max(1, self.page_bytes // len(paragraph))
+        data = f"<html><body>{paragraph * repeats}</body></html>".encode('utf-8')
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/html; charset=utf-8')
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, format, *args):
+        pass
+
+def start_server(handler):
+    server = ThreadingHTTPServer(('127.0.0.1', 0), handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+def percentile(values, pct):
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, math.ceil(pct / 100 * len(ordered)) - 1))
+    return ordered[index]
+
+# CPU seconds, current RSS and peak RSS of a replica process, read from /proc
+def process_usage(pid):
+    with open(f'/proc/{pid}/stat') as f:
+        fields = f.read().rsplit(')', 1)[1].split()
+    with open(f'/proc/{pid}/statm') as f:
+        rss_bytes = int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    peak_rss_bytes = rss_bytes
+    with open(f'/proc/{pid}/status') as f:
+        for line in f:
+            if line.startswith('VmHWM:'):
+                peak_rss_bytes = int(line.split()[1]) * 1024
+    return {
+        'cpu_seconds': (int(fields[11]) + int(fields[12])) / os.sysconf('SC_CLK_TCK'),
+        'rss_bytes': rss_bytes,
+        'peak_rss_bytes': peak_rss_bytes,
+    }
+
+# One `streamlit run` process serving the app on its own port
+class Replica:
+    def __init__(self, app_path, env, log_dir):
+        self.port = free_port()
+        self.base_url = f"http://127.0.0.1:{self.port}"
+        self.log = open(os.path.join(log_dir, f'replica-{self.port}.log'), 'wb')
+        self.process = subprocess.Popen(
+            [sys.executable, '-m', 'streamlit', 'run', app_path,
+             '--server.port', str(self.port), '--server.address', '127.0.0.1',
+             '--server.headless', 'true', '--server.fileWatcherType', 'none',
+             '--server.enableXsrfProtection', 'false', '--browser.gatherUsageStats', 'false'],
+            cwd=os.path.dirname(app_path), env=env, stdout=self.log, stderr=subprocess.STDOUT)
+
+    def wait_ready(self, timeout=60):
+        deadline = time.time() + timeout
+        while time.time() < deadline:
+            if self.process.poll() is not None:
+                raise RuntimeError(f"replica exited with code {self.process.returncode}, see {self.log.name}")
+            try:
+                with urllib.request.urlopen(f"{self.base_url}/_stcore/health", timeout=1) as response:
+                    if response.status == 200:
+                        return
+            except OSError:
+                time.sleep(0.2)
+        raise RuntimeError(f"replica did not start within {timeout}s, see {self.log.name}")
+
+    def stop(self):
+        self.process.terminate()
+        try:
+            self.process.wait(10)
+        except subprocess.TimeoutExpired:
+            self.process.kill()
+        self.log.close()
+
+# Minimal browser stand-in speaking Streamlit's websocket protocol: it sends
+# rerun requests carrying widget states, like the frontend does on every
+# interaction, and reads deltas until the script run finishes
+class StreamlitSession:
+    def __init__(self, ws, base_url, query_string, timeout):
+        self.ws = ws
+        self.base_url = base_url
+        self.query_string = query_string
+        self.timeout = timeout
+        self.widgets = {}
+        self.states = {}
+        self.page_script_hash = ''
+        self.bytes_received = 0
+        self.errors = []
+        self.captions = []
+
+    def has(self, key):
+        return key in self.widgets
+
+    def set(self, key, **value):
+        widget = self.widgets[key]
+        self.states[widget['id']] = WidgetState(id=widget['id'], **value)
+        self.rerun(widget['fragment_id'])
+
+    def click(self, key):
+        widget = self.widgets[key]
+        self.rerun(widget['fragment_id'], [WidgetState(id=widget['id'], trigger_value=True)])
+
+    def rerun(self, fragment_id='', triggers=()):
+        msg = BackMsg()
+        state = msg.rerun_script
+        state.query_string = self.query_string
+        state.page_script_hash = self.page_script_hash
+        state.fragment_id = fragment_id
+        state.widget_states.widgets.extend(list(self.states.values()) + list(triggers))
+        self.ws.send(msg.SerializeToString())
+        self._wait(fragment_id)
+
+    def download(self, key):
+        with urllib.request.urlopen(self.base_url + self.widgets[key]['proto'].url,
+                                    timeout=self.timeout) as response:
+            data = response.read()
+        self.bytes_received += len(data)
+        return data
+
+    def _wait(self, fragment_id):
+        if not fragment_id:
+            self.widgets = {}
+            self.errors = []
+            self.captions = []
+        while True:
+            data = self.ws.recv(timeout=self.timeout)
+            self.bytes_received += len(data)
+            msg = ForwardMsg()
+            msg.ParseFromString(data)
+            kind = msg.WhichOneof('type')
+            if kind == 'new_session':
+                self.page_script_hash = msg.new_session.page_script_hash
+            elif kind == 'delta' and msg.delta.WhichOneof('type') == 'new_element':
+                self._record(msg.delta.new_element, msg.delta.fragment_id)
+            elif kind == 'script_finished':
+                status = msg.script_finished
+                if status == ForwardMsg.FINISHED_WITH_COMPILE_ERROR:
+                    raise RuntimeError('script failed to compile')
+                if status != ForwardMsg.FINISHED_EARLY_FOR_RERUN:
+                    return
+
+    def _record(self, element, fragment_id):
+        kind = element.WhichOneof('type')
+        if kind == 'exception':
+            self.errors.append(element.exception.message)
+        elif kind == 'alert' and element.alert.format == Alert.ERROR:
+            self.errors.append(element.alert.body)
+        elif kind == 'markdown':
+            self.captions.append(element.markdown.body)
+        elif kind in WIDGET_TYPES:
+            proto = getattr(element, kind)
+            key = proto.id.split('-', 2)[-1] if proto.id.startswith('$$ID-') else proto.id
+            self.widgets[key] = {'id': proto.id, 'proto': proto, 'fragment_id': fragment_id}
+
+WIDGET_TYPES = {'button', 'checkbox', 'download_button', 'number_input', 'selectbox',
+                'text_area', 'text_input'}
+
+def check(session, step):
+    if session.errors:
+        raise RuntimeError(f"{step}: {session.errors[0]}")
+
+# Drive one simulated teacher through the full quiz flow, timing each step
+def run_session(config, source, base_url):
+    timings = {}
+    try:
+        started = time.perf_counter()
+        with connect(base_url.replace('http', 'ws', 1) + '/_stcore/stream', subprotocols=['streamlit'],
+                     max_size=None, open_timeout=config['step_timeout']) as ws:
+            session = StreamlitSession(ws, base_url, 'page=Quiz+Generator', config['step_timeout'])
+            session.rerun()
+            session.set('agree_terms', bool_value=True)
+            session.click('continue_terms')
+            check(session, 'accept_terms')
+            timings['accept_terms'] = time.perf_counter() - started
+
+            started = time.perf_counter()
+            session.set('api_key', string_value='sk-' + 'x' * 120)
+            for i in range(config['urls']):
+                session.set(f'url_{i}', string_value=f"{config['web_base']}/source/{source}/page/{i}")
+            check(session, 'enter_urls')
+            timings['enter_urls'] = time.perf_counter() - started
+
+            started = time.perf_counter()
+            session.click('process_urls')
+            check(session, 'process')
+            if not session.has('generate_quiz'):
+                raise RuntimeError('process: URLs were not processed')
+            timings['process'] = time.perf_counter() - started
+
+            started = time.perf_counter()
+            session.set('difficulty', string_value='Intermediate')
+            session.set('num_questions', double_value=config['questions'])
+            check(session, 'configure')
+            timings['configure'] = time.perf_counter() - started
+
+            started = time.perf_counter()
+            session.click('generate_quiz')
+            check(session, 'generate')
+            if not session.has('download_pdf'):
+                raise RuntimeError('generate: no quiz was generated')
+            timings['generate'] = time.perf_counter() - started
+
+            started = time.perf_counter()
+            if session.download('download_pdf')[:4] != b'%PDF':
+                raise RuntimeError('download: response is not a PDF')
+            timings['download'] = time.perf_counter() - started
+
+            # Retype the API key on the quiz page; timed per edit, since this
+            # is the rerun a widget edit costs with the full quiz on screen
+            if config['edits']:
+                bytes_before = session.bytes_received
+                started = time.perf_counter()
+                for i in range(config['edits']):
+                    session.set('api_key', string_value=f'sk-{i}' + 'y' * 120)
+                check(session, 'edit')
+                timings['edit'] = (time.perf_counter() - started) / config['edits']
+                edit_bytes = (session.bytes_received - bytes_before) / config['edits']
+
+            served = 0
+            for caption in session.captions:
+                match = re.match(r'(\d+) question\(s\) served from the question bank', caption)
+                if match:
+                    served = int(match.group(1))
+            return {'ok': True, 'timings': timings, 'bank_served': served,
+                    'bytes_received': session.bytes_received,
+                    'edit_bytes': edit_bytes if config['edits'] else 0}
+    except Exception as e:
+        return {'ok': False, 'timings': timings, 'error': f"{type(e).__name__}: {e}"}
+
+# Start the replicas for one concurrency level, warm them up and run the
+# measured sessions, spreading sessions across replicas round robin
+def run_level(config, replicas):
+    servers = []
+    for index in range(replicas):
+        bank = 'shared' if config['warm_bank'] else f"c{config['concurrency']}-r{index}"
+        env = dict(os.environ, OPENAI_API_BASE=config['openai_base'], PYTHONUNBUFFERED='1',
+                   QUIZGENIUS_QUESTION_BANK=os.path.join(config['work_dir'], f'question_bank-{bank}.db'))
+        servers.append(Replica(config['app_path'], env, config['work_dir']))
+    try:
+        for server in servers:
+            server.wait_ready()
+        for index, server in enumerate(servers):
+            for i in range(config['warmup']):
+                run_session(config, f'warmup-{index}-{i}', server.base_url)
+
+        usage_before = [process_usage(server.process.pid) for server in servers]
+        total = config['sessions'] * replicas
+        wall_started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=config['concurrency'] * replicas) as pool:
+            sessions = list(pool.map(lambda i: run_session(config, i % config['distinct_sources'],
+                                                            servers[i % replicas].base_url),
+                                     range(total)))
+        wall = time.perf_counter() - wall_started
+        usage_after = [process_usage(server.process.pid) for server in servers]
+    finally:
+        for server in servers:
+            server.stop()
+
+    ok = [s for s in sessions if s['ok']]
+    steps = {}
+    for step in [step for step in STEPS if config['edits'] or step != 'edit'] + ['total']:
+        if step == 'total':
+            values = [sum(t for name, t in s['timings'].items() if name != 'edit') for s in ok]
+        else:
+            values = [s['timings'][step] for s in ok if step in s['timings']]
+        steps[step] = {f'p{p}': percentile(values, p) * 1000 for p in (50, 90, 95, 99)}
+    errors = {}
+    for s in sessions:
+        if not s['ok']:
+            errors[s['error']] = errors.get(s['error'], 0) + 1
+    replica_stats = []
+    for server, before, after in zip(servers, usage_before, usage_after):
+        cpu_seconds = after['cpu_seconds'] - before['cpu_seconds']
+        replica_stats.append({
+            'pid': server.process.pid,
+            'cpu_seconds': cpu_seconds,
+            'cpu_percent': 100 * cpu_seconds / max(wall, 1e-9),
+            'rss_bytes': after['rss_bytes'],
+            'peak_rss_bytes': after['peak_rss_bytes'],
+        })
+    return {
+        'concurrency': config['concurrency'],
+        'replicas': replicas,
+        'sessions': len(sessions),
+        'failed': len(sessions) - len(ok),
+        'sessions_per_sec': len(ok) / max(wall, 1e-9),
+        'bank_served_ratio': sum(s['bank_served'] for s in ok) / max(1, len(ok) * config['questions']),
+        'kib_per_session': sum(s['bytes_received'] for s in ok) / max(1, len(ok)) / 1024,
+        'kib_per_edit': sum(s['edit_bytes'] for s in ok) / max(1, len(ok)) / 1024,
+        'steps_ms': steps,
+        'replica_stats': replica_stats,
+        'errors': errors,
+    }
+
+def print_level(level):
+    print(f"\nconcurrency={level['concurrency']} replicas={level['replicas']} "
+          f"sessions={level['sessions']} failed={level['failed']} "
+          f"throughput={level['sessions_per_sec']:.2f} sessions/sec "
+          f"served from question bank={level['bank_served_ratio']:.0%} "
+          f"received={level['kib_per_session']:.0f} KiB/session")
+    if 'edit' in level['steps_ms']:
+        print(f"  edit reruns received {level['kib_per_edit']:.1f} KiB each")
+    print(f"  {'step':<14}{'p50 ms':>10}{'p90 ms':>10}{'p95 ms':>10}{'p99 ms':>10}")
+    for step, pcts in level['steps_ms'].items():
+        print(f"  {step:<14}{pcts['p50']:>10.1f}{pcts['p90']:>10.1f}{pcts['p95']:>10.1f}{pcts['p99']:>10.1f}")
+    for stats in level['replica_stats']:
+        print(f"  replica {stats['pid']}: cpu {stats['cpu_seconds']:.1f}s ({stats['cpu_percent']:.0f}%), "
+              f"rss {stats['rss_bytes'] / 2**20:.1f} MiB, peak rss {stats['peak_rss_bytes'] / 2**20:.1f} MiB")
+    for error, count in level['errors'].items():
+        print(f"  error x{count}: {error}")
+
+# Saturation is the first level whose throughput no longer improves by the
+# given ratio, or whose p95 session latency exceeds the allowed maximum
+def find_saturation(levels, min_gain, max_p95_ms):
+    for previous, level in zip([None] + levels[:-1], levels):
+        if max_p95_ms and level['steps_ms']['total']['p95'] > max_p95_ms:
+            return level['concurrency']
+        if previous and level['sessions_per_sec'] < previous['sessions_per_sec'] * (1 + min_gain):
+            return previous['concurrency']
+    return None
+
+# Compare against a saved run; returns a list of human-readable regressions
+def compare_to_baseline(levels, baseline, tolerance):
+    regressions = []
+    saved = {level['concurrency']: level for level in baseline['levels']}
+    for level in levels:
+        old = saved.get(level['concurrency'])
+        if old is None:
+            continue
+        if level['sessions_per_sec'] < old['sessions_per_sec'] * (1 - tolerance):
+            regressions.append(f"concurrency {level['concurrency']}: throughput "
+                               f"{level['sessions_per_sec']:.2f} < baseline {old['sessions_per_sec']:.2f} sessions/sec")
+        for step, pcts in level['steps_ms'].items():
+            old_p95 = old['steps_ms'].get(step, {}).get('p95')
+            if old_p95 and pcts['p95'] > old_p95 * (1 + tolerance):
+                regressions.append(f"concurrency {level['concurrency']}: {step} p95 "
+                                   f"{pcts['p95']:.1f} ms > baseline {old_p95:.1f} ms")
+        if level['failed'] > old['failed']:
+            regressions.append(f"concurrency {level['concurrency']}: {level['failed']} failed sessions "
+                               f"(baseline {old['failed']})")
+    return regressions
+
+def parse_args(argv):
+    parser = argparse.ArgumentParser(description='Multi-session load test for QuizGenius (app.py).')
+    parser.add_argument('--app', default=os.path.join(APP_DIR, 'app.py'), help='Streamlit script to serve')
+    parser.add_argument('--sessions', type=int, default=10, help='sessions per replica at each concurrency level')
+    parser.add_argument('--concurrency', default='4',
+                        help='concurrent sessions per replica; a comma-separated list ramps through levels')
+    parser.add_argument('--replicas', type=int, default=1, help='number of `streamlit run` server processes')
+    parser.add_argument('--warmup', type=int, default=1, help='untimed sessions per replica before measuring')
+    parser.add_argument('--urls', type=int, default=2, choices=range(1, 6), help='URLs entered per session')
+    parser.add_argument('--questions', type=int, default=10, help='questions requested per quiz')
+    parser.add_argument('--edits', type=int, default=0,
+                        help='API key edits timed per session after the quiz is shown (not part of total)')
+    parser.add_argument('--warm-bank', action='store_true',
+                        help='share one question bank across replicas and levels instead of a fresh one each')
+    parser.add_argument('--distinct-sources', type=int, default=5, help='number of distinct URL sets across sessions')
+    parser.add_argument('--page-kb', type=int, default=8, help='size of each mock web page')
+    parser.add_argument('--openai-latency-ms', type=float, default=0, help='artificial latency per mock OpenAI call')
+    parser.add_argument('--step-timeout', type=float, default=60, help='timeout per script run, seconds')
+    parser.add_argument('--min-gain', type=float, default=0.1,
+                        help='throughput gain below which the next level counts as saturated')
+    parser.add_argument('--max-p95-ms', type=float, default=0, help='p95 session latency that counts as saturated')
+    parser.add_argument('--json', help='write the full report to this file')
+    parser.add_argument('--save-baseline', help='write the report as a baseline for later comparison')
+    parser.add_argument('--baseline', help='compare against a saved baseline and exit 1 on regression')
+    parser.add_argument('--tolerance', type=float, default=0.2, help='allowed relative slowdown against the baseline')
+    return parser.parse_args(argv)
+
+def main(argv=None):
+    args = parse_args(argv)
+    MockOpenAIHandler.latency = args.openai_latency_ms / 1000
+    MockWebHandler.page_bytes = args.page_kb * 1024
+    openai_server = start_server(MockOpenAIHandler)
+    web_server = start_server(MockWebHandler)
+
+    config = {
+        'sessions': args.sessions,
+        'warmup': args.warmup,
+        'urls': args.urls,
+        'questions': args.questions,
+        'edits': args.edits,
+        'distinct_sources': max(1, args.distinct_sources),
+        'step_timeout': args.step_timeout,
+        'app_path': os.path.abspath(args.app),
+        'warm_bank': args.warm_bank,
+        # Replica logs and question banks, kept out of the real question bank
+        'work_dir': tempfile.mkdtemp(prefix='quizgenius-loadtest-'),
+        'openai_base': f"http://127.0.0.1:{openai_server.server_address[1]}/v1",
+        'web_base': f"http://127.0.0.1:{web_server.server_address[1]}",
+    }
+
+    levels = []
+    for concurrency in [int(c) for c in args.concurrency.split(',')]:
+        level = run_level(dict(config, concurrency=concurrency), args.replicas)
+        print_level(level)
+        levels.append(level)
+
+    report = {'config': vars(args), 'levels': levels}
+    if len(levels) > 1:
+        report['saturation_concurrency'] = find_saturation(levels, args.min_gain, args.max_p95_ms)
+        if report['saturation_concurrency']:
+            print(f"\nsaturation point: concurrency {report['saturation_concurrency']}")
+        else:
+            print("\nsaturation point: not reached")
+
+    for path in (args.json, args.save_baseline):
+        if path:
+            with open(path, 'w') as f:
+                json.dump(report, f, indent=2)
+
+    openai_server.shutdown()
+    web_server.shutdown()
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            regressions = compare_to_baseline(levels, json.load(f), args.tolerance)
+        for regression in regressions:
+            print(f"REGRESSION: {regression}")
+        if regressions:
+            return 1
+        print("\nno regressions against baseline")
+    return 0 if all(level['failed'] == 0 for level in levels) else 1
+
+if __name__ == '__main__':
+    sys.exit(main())
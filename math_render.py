@@ -0,0 +1,93 @@
+# LaTeX math for QuizGenius PDF export: splitting quiz lines into text and
+# math segments, and a process-wide cache of expressions rendered to PNG.
+# Kept apart from app.py so it can be imported and tested without running
+# the Streamlit page.
+import io
+import re
+import hashlib
+import threading
+from collections import OrderedDict
+
+import numpy as np
+from matplotlib import mathtext
+from matplotlib.font_manager import FontProperties
+from PIL import Image
+
+# Process-wide cache of LaTeX expressions rendered to PNG with matplotlib
+# mathtext for PDF export. Each distinct expression is rendered once, keyed
+# by its hash, and reused across every quiz exported by this process.
+class MathRenderCache:
+    def __init__(self, max_entries=5000, dpi=300, font_size=11):
+        self.max_entries = max_entries
+        self.dpi = dpi
+        self.font_size = font_size
+        self.hits = 0
+        self.misses = 0
+        self._images = OrderedDict()  # hash -> (png bytes, width mm, height mm) or None
+        self._lock = threading.Lock()
+        self._render_lock = threading.Lock()
+        self._parser = mathtext.MathTextParser('agg')
+
+    # Return (png bytes, width mm, height mm), or None if mathtext can't parse it
+    def render(self, expression):
+        key = hashlib.sha256(expression.encode('utf-8')).hexdigest()
+        with self._lock:
+            if key in self._images:
+                self.hits += 1
+                self._images.move_to_end(key)
+                return self._images[key]
+            self.misses += 1
+
+        try:
+            # Parse once straight to a raster; the parser isn't thread-safe
+            with self._render_lock:
+                parsed = self._parser.parse(f"${expression}$", dpi=self.dpi,
+                                            prop=FontProperties(size=self.font_size))
+            # Glyph coverage becomes black ink on a white grayscale image
+            image = Image.fromarray(255 - np.asarray(parsed.image))
+            buffer = io.BytesIO()
+            image.save(buffer, format='PNG')
+            width_px, height_px = image.size
+            rendered = (buffer.getvalue(), width_px / self.dpi * 25.4, height_px / self.dpi * 25.4)
+        except Exception as e:
+            print(f"Math rendering error for {expression!r}: {str(e)}")
+            rendered = None
+
+        with self._lock:
+            self._images[key] = rendered
+            while len(self._images) > self.max_entries:
+                self._images.popitem(last=False)
+        return rendered
+
+    def hit_rate(self):
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
+
+# Matches $$display$$ and $inline$ math, ignoring escaped \$ signs. Inline
+# math follows pandoc's rules so prices like "$5 and $10" stay text: no space
+# after the opening $, no space before the closing $, no digit right after it,
+# and no unescaped $ inside.
+MATH_PATTERN = re.compile(r'(?<!\\)\$\$(.+?)(?<!\\)\$\$|(?<!\\)\$(?!\s)((?:\\\$|[^$])+?)(?<![\s\\])\$(?!\d)')
+
+# Split a line into ('text', str), ('inline', expr) and ('display', expr) segments
+def split_math_segments(line):
+    segments = []
+    position = 0
+    for match in MATH_PATTERN.finditer(line):
+        if match.start() > position:
+            segments.append(('text', line[position:match.start()].replace('\\$', '$')))
+        if match.group(1) is not None:
+            segments.append(('display', match.group(1).strip()))
+        else:
+            segments.append(('inline', match.group(2).strip()))
+        position = match.end()
+    if position < len(line):
+        segments.append(('text', line[position:].replace('\\$', '$')))
+    return segments
+
+# Shrink a rendered expression to fit max_width, keeping its aspect ratio
+def fit_math_image(image, max_width):
+    if image is None or image[1] <= max_width:
+        return image
+    png, width, height = image
+    return png, max_width, height * max_width / width
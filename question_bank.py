@@ -0,0 +1,220 @@
+# Question bank for QuizGenius: SQLite storage with MinHash near-duplicate
+# detection, plus the helpers that split generated quizzes into questions and
+# put them back together. Kept apart from app.py so it can be imported and
+# tested without running the Streamlit page.
+import re
+import time
+import random
+import sqlite3
+import hashlib
+import threading
+from array import array
+
+# Local SQLite question bank. Generated questions are stored per source hash,
+# subject, difficulty, question type and focus text so repeated requests can be
+# served without calling the model. Near-duplicates are detected with MinHash
+# signatures and LSH band buckets, scoped to the same request key.
+class QuestionBank:
+    NUM_PERMUTATIONS = 64
+    BANDS = 16  # 16 bands of 4 rows: candidate pairs from roughly 0.5 similarity
+    SIMILARITY_THRESHOLD = 0.7
+    _PRIME = (1 << 61) - 1
+
+    def __init__(self, path):
+        self.path = path
+        self._local = threading.local()
+        self._write_lock = threading.Lock()
+        # Fixed seed so signatures stay comparable across processes and restarts
+        rng = random.Random(20241115)
+        self._permutations = [(rng.randrange(1, self._PRIME), rng.randrange(0, self._PRIME))
+                              for _ in range(self.NUM_PERMUTATIONS)]
+        conn = self._connection()
+        conn.execute('PRAGMA journal_mode=WAL')
+        conn.executescript("""
+            CREATE TABLE IF NOT EXISTS questions (
+                id INTEGER PRIMARY KEY,
+                source_hash TEXT NOT NULL,
+                subject TEXT NOT NULL,
+                difficulty TEXT NOT NULL,
+                question_type TEXT NOT NULL,
+                focus TEXT NOT NULL,
+                text TEXT NOT NULL,
+                minhash BLOB NOT NULL,
+                created_at REAL NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS questions_lookup
+                ON questions (source_hash, subject, difficulty, question_type, focus);
+            CREATE TABLE IF NOT EXISTS lsh_buckets (
+                bank_key TEXT NOT NULL,
+                band INTEGER NOT NULL,
+                bucket TEXT NOT NULL,
+                question_id INTEGER NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS lsh_lookup ON lsh_buckets (bank_key, band, bucket);
+            CREATE TABLE IF NOT EXISTS sources (
+                source_hash TEXT PRIMARY KEY,
+                subject TEXT NOT NULL,
+                created_at REAL NOT NULL
+            );
+        """)
+        conn.commit()
+
+    # One connection per thread, since sqlite3 connections can't be shared
+    def _connection(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30)
+            self._local.conn = conn
+        return conn
+
+    # MinHash signature over word 3-gram shingles of the normalised question
+    def signature(self, text):
+        words = re.sub(r'\s+', ' ', text.lower()).split(' ')
+        shingles = {' '.join(words[i:i + 3]) for i in range(max(1, len(words) - 2))}
+        hashes = [int.from_bytes(hashlib.blake2b(s.encode('utf-8'), digest_size=8).digest(), 'little')
+                  for s in shingles]
+        return array('Q', [min((a * h + b) % self._PRIME for h in hashes) for a, b in self._permutations])
+
+    def _buckets(self, signature):
+        rows = self.NUM_PERMUTATIONS // self.BANDS
+        return [(band, hashlib.blake2b(signature[band * rows:(band + 1) * rows].tobytes(),
+                                       digest_size=8).hexdigest())
+                for band in range(self.BANDS)]
+
+    @staticmethod
+    def similarity(first, second):
+        return sum(a == b for a, b in zip(first, second)) / len(first)
+
+    # Buckets are grouped per full request key, the same key fetch() serves
+    # from, so a question stored for one difficulty or focus doesn't block
+    # a similar question for another
+    @staticmethod
+    def _bank_key(source_hash, subject, difficulty, question_type, focus):
+        key = '\x1f'.join((source_hash, subject, difficulty, question_type, focus))
+        return hashlib.blake2b(key.encode('utf-8'), digest_size=16).hexdigest()
+
+    def _is_near_duplicate(self, conn, bank_key, signature, accepted):
+        if any(self.similarity(signature, other) >= self.SIMILARITY_THRESHOLD for other in accepted):
+            return True
+        candidates = set()
+        for band, bucket in self._buckets(signature):
+            candidates.update(row[0] for row in conn.execute(
+                "SELECT question_id FROM lsh_buckets WHERE bank_key = ? AND band = ? AND bucket = ?",
+                (bank_key, band, bucket)))
+        for question_id in candidates:
+            row = conn.execute("SELECT minhash FROM questions WHERE id = ?", (question_id,)).fetchone()
+            if row and self.similarity(signature, array('Q', row[0])) >= self.SIMILARITY_THRESHOLD:
+                return True
+        return False
+
+    # Subject key for a source. The model words its subject differently on every
+    # run ("Mathematics", then "Mathematics (Calculus)"), so the first detected
+    # subject is stored per source and reused, keeping repeated requests on the
+    # same bank key. Pass None when detection failed: "general" is used for that
+    # run without being stored.
+    def source_subject(self, source_hash, detected_subject):
+        conn = self._connection()
+        query = "SELECT subject FROM sources WHERE source_hash = ?"
+        row = conn.execute(query, (source_hash,)).fetchone()
+        if row:
+            return row[0]
+        if not detected_subject:
+            return 'general'
+        with self._write_lock:
+            conn.execute("INSERT OR IGNORE INTO sources (source_hash, subject, created_at) VALUES (?, ?, ?)",
+                         (source_hash, subject_key(detected_subject), time.time()))
+            conn.commit()
+        # Another session or replica may have stored its subject first
+        return conn.execute(query, (source_hash,)).fetchone()[0]
+
+    # Return up to `limit` distinct stored questions for this request, in random order
+    def fetch(self, source_hash, subject, difficulty, question_type, focus, limit):
+        rows = self._connection().execute(
+            """SELECT text FROM questions
+               WHERE source_hash = ? AND subject = ? AND difficulty = ? AND question_type = ? AND focus = ?
+               ORDER BY RANDOM() LIMIT ?""",
+            (source_hash, subject, difficulty, question_type, focus, limit))
+        return [row[0] for row in rows]
+
+    # Store new questions, skipping near-duplicates of stored questions, of
+    # `existing` and of each other. Returns the questions that were kept.
+    def add(self, source_hash, subject, difficulty, question_type, focus, questions, existing=()):
+        bank_key = self._bank_key(source_hash, subject, difficulty, question_type, focus)
+        accepted = [self.signature(text) for text in existing]
+        kept = []
+        conn = self._connection()
+        with self._write_lock:
+            for text in questions:
+                signature = self.signature(text)
+                if self._is_near_duplicate(conn, bank_key, signature, accepted):
+                    continue
+                cursor = conn.execute(
+                    """INSERT INTO questions
+                       (source_hash, subject, difficulty, question_type, focus, text, minhash, created_at)
+                       VALUES (?, ?, ?, ?, ?, ?, ?, ?)""",
+                    (source_hash, subject, difficulty, question_type, focus, text, signature.tobytes(), time.time()))
+                conn.executemany(
+                    "INSERT INTO lsh_buckets (bank_key, band, bucket, question_id) VALUES (?, ?, ?, ?)",
+                    [(bank_key, band, bucket, cursor.lastrowid) for band, bucket in self._buckets(signature)])
+                accepted.append(signature)
+                kept.append(text)
+            conn.commit()
+        return kept
+
+# Short, stable subject name from detect_subject_area output, used as a bank key
+def subject_key(detected_subject):
+    text = detected_subject or ''
+    match = re.search(r'Primary Subject:\s*(.+)', text)
+    line = match.group(1) if match else next((l for l in text.splitlines() if l.strip()), '')
+    return re.sub(r'[*\[\]]', '', line).strip().lower()[:100] or 'general'
+
+# Numbered question starts: "1. ...", "Question 1:", "**2.**", "### Question 3"
+QUESTION_START = re.compile(r'^\s*(?:#+\s*)?(?:\*\*)?\s*(?:Question\s+)?(\d+)\s*[.):]\s*(?:\*\*)?\s*', re.IGNORECASE)
+
+# Quiz-wide sections models append after the last question: "Answer Key:",
+# "**Answers**", "## Solutions", "Marking Scheme", ...
+SECTION_HEADING = re.compile(
+    r'^\s*(?:#+\s*)?(?:\*\*)?\s*(?:answer\s+key|answer\s+sheet|answers|solutions|marking\s+scheme|'
+    r'scoring\s+guide|grading\s+rubric|rubric|total\s+(?:points|marks)|end\s+of\s+(?:the\s+)?quiz)'
+    r'\s*(?:\*\*)?\s*(?:[:(].*)?$',
+    re.IGNORECASE)
+
+# Split generated quiz text into question blocks, dropping the header and numbering.
+# Later questions must continue the numbering and not be indented deeper than the
+# first one, so numbered solution steps stay inside their question. An unindented
+# section heading such as "Answer Key:" starts a tail that is dropped, unless the
+# question numbering continues after it: then it was part of the question.
+def split_quiz_questions(quiz_text):
+    questions = []
+    tail = None
+    expected = None
+    base_indent = None
+    for line in quiz_text.split('\n'):
+        match = QUESTION_START.match(line)
+        indent = len(line) - len(line.lstrip())
+        if match and (expected is None or (int(match.group(1)) == expected and indent <= base_indent)):
+            if tail:
+                questions[-1].extend(tail)
+                tail = None
+            expected = int(match.group(1)) + 1
+            if base_indent is None:
+                base_indent = indent
+            questions.append([line[match.end():]])
+        elif tail is not None:
+            tail.append(line)
+        elif questions and indent <= base_indent and SECTION_HEADING.match(line):
+            tail = [line]
+        elif questions:
+            questions[-1].append(line)
+    return ['\n'.join(lines).strip() for lines in questions if '\n'.join(lines).strip()]
+
+# Estimated minutes per question, scaled by difficulty
+MINUTES_PER_QUESTION = {"Multiple Choice": 1.5, "Problem Solving": 5, "Essay": 10, "Mixed": 4}
+DIFFICULTY_TIME_FACTOR = {"Beginner": 1.0, "Intermediate": 1.25, "Advanced": 1.5}
+
+# Number the questions and add a time limit for the whole quiz
+def compose_quiz(questions, difficulty, question_type):
+    minutes = len(questions) * MINUTES_PER_QUESTION.get(question_type, 4) * DIFFICULTY_TIME_FACTOR.get(difficulty, 1.0)
+    time_limit = max(5, int(-(-minutes // 5) * 5))  # round up to 5 minutes
+    numbered = [f"{i}. {question}" for i, question in enumerate(questions, start=1)]
+    return f"Time Limit: {time_limit} minutes\n\n" + "\n\n".join(numbered)
@@ -0,0 +1,58 @@
+import os
+
+import pytest
+
+from content_store import ContentStore
+
+@pytest.fixture(params=[True, False], ids=['compressed', 'plain'])
+def compress(request):
+    return request.param
+
+def make_text(seed, size=4000):
+    return "".join(chr(0x41 + (seed * 7 + i * 13) % 26) for i in range(size))
+
+def test_put_deduplicates_identical_text(tmp_path, compress):
+    store = ContentStore(10 ** 6, str(tmp_path), compress)
+    first = store.put("same content")
+    assert store.put("same content") == first
+    assert store.put("other content") != first
+    assert store.stats()['memory_entries'] == 2
+
+def test_least_recently_used_spills_past_memory_budget(tmp_path):
+    store = ContentStore(9000, str(tmp_path), compress=False)
+    first, second = store.put(make_text(1)), store.put(make_text(2))
+    store.get(first)  # first is now the most recently used
+    third = store.put(make_text(3))
+    stats = store.stats()
+    assert stats['memory_entries'] == 2 and stats['spilled_entries'] == 1
+    assert os.listdir(tmp_path) == [second + '.txt']
+    # Spilled bundles are still readable
+    assert store.get(second) == make_text(2)
+    assert store.get(first) == make_text(1) and store.get(third) == make_text(3)
+
+def test_eviction_past_disk_budget_raises_key_error(tmp_path):
+    store = ContentStore(0, str(tmp_path), compress=False, disk_budget=9000)
+    refs = [store.put(make_text(i)) for i in range(3)]
+    assert store.stats()['spilled_entries'] == 2
+    assert store.stats()['spilled_bytes'] <= 9000
+    with pytest.raises(KeyError):
+        store.get(refs[0])
+    assert store.get(refs[2]) == make_text(2)
+
+def test_put_picks_up_bundle_spilled_by_another_store(tmp_path, compress):
+    text = make_text(4)
+    ref = ContentStore(0, str(tmp_path), compress).put(text)
+    other = ContentStore(0, str(tmp_path), compress)
+    assert other.put(text) == ref
+    assert other.stats()['spilled_entries'] == 1
+    assert other.get(ref) == text
+
+@pytest.mark.parametrize('budget', [10 ** 6, 0], ids=['memory', 'spilled'])
+def test_get_limit_on_multibyte_utf8(tmp_path, compress, budget):
+    text = "é∑😀a" * 500
+    store = ContentStore(budget, str(tmp_path), compress)
+    ref = store.put(text)
+    for limit in (1, 3, 7, 1000):
+        assert store.get(ref, limit=limit) == text[:limit]
+    assert store.get(ref, limit=10 ** 6) == text
+    assert store.get(ref) == text
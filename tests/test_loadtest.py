@@ -0,0 +1,69 @@
+import pytest
+
+from loadtest import compare_to_baseline, find_saturation, percentile
+
+def level(concurrency, throughput, p95_ms=1000.0, failed=0, generate_p95_ms=500.0):
+    return {
+        'concurrency': concurrency,
+        'sessions_per_sec': throughput,
+        'failed': failed,
+        'steps_ms': {
+            'generate': {'p50': generate_p95_ms / 2, 'p95': generate_p95_ms},
+            'total': {'p50': p95_ms / 2, 'p95': p95_ms},
+        },
+    }
+
+# percentile
+
+def test_percentile_nearest_rank():
+    values = [5, 1, 4, 2, 3]
+    assert percentile(values, 50) == 3
+    assert percentile(values, 90) == 5
+    assert percentile(values, 1) == 1
+    assert percentile(values, 100) == 5
+
+def test_percentile_of_nothing_is_zero():
+    assert percentile([], 95) == 0.0
+
+# find_saturation
+
+def test_saturation_at_throughput_plateau():
+    levels = [level(1, 1.0), level(2, 1.9), level(4, 3.5), level(8, 3.6), level(16, 3.4)]
+    assert find_saturation(levels, min_gain=0.1, max_p95_ms=0) == 4
+
+def test_saturation_at_p95_cap():
+    levels = [level(1, 1.0, p95_ms=800), level(2, 2.0, p95_ms=1500), level(4, 4.0, p95_ms=2500)]
+    assert find_saturation(levels, min_gain=0.1, max_p95_ms=2000) == 4
+
+def test_saturation_when_first_level_is_over_p95_cap():
+    assert find_saturation([level(1, 1.0, p95_ms=3000), level(2, 2.0)], min_gain=0.1, max_p95_ms=2000) == 1
+
+def test_saturation_not_reached_while_scaling():
+    levels = [level(1, 1.0), level(2, 2.0), level(4, 3.9)]
+    assert find_saturation(levels, min_gain=0.1, max_p95_ms=0) is None
+
+# compare_to_baseline
+
+def test_no_regressions_within_tolerance():
+    baseline = {'levels': [level(4, 2.0, p95_ms=1000)]}
+    assert compare_to_baseline([level(4, 1.7, p95_ms=1150)], baseline, tolerance=0.2) == []
+
+def test_throughput_regression():
+    baseline = {'levels': [level(4, 2.0)]}
+    regressions = compare_to_baseline([level(4, 1.5)], baseline, tolerance=0.2)
+    assert regressions == ["concurrency 4: throughput 1.50 < baseline 2.00 sessions/sec"]
+
+def test_step_p95_regression():
+    baseline = {'levels': [level(4, 2.0, generate_p95_ms=500)]}
+    regressions = compare_to_baseline([level(4, 2.0, generate_p95_ms=700)], baseline, tolerance=0.2)
+    assert regressions == ["concurrency 4: generate p95 700.0 ms > baseline 500.0 ms"]
+
+def test_more_failures_than_baseline():
+    baseline = {'levels': [level(4, 2.0, failed=1)]}
+    assert compare_to_baseline([level(4, 2.0, failed=1)], baseline, tolerance=0.2) == []
+    regressions = compare_to_baseline([level(4, 2.0, failed=3)], baseline, tolerance=0.2)
+    assert regressions == ["concurrency 4: 3 failed sessions (baseline 1)"]
+
+def test_levels_missing_from_baseline_are_skipped():
+    baseline = {'levels': [level(4, 2.0)]}
+    assert compare_to_baseline([level(8, 0.1, failed=5)], baseline, tolerance=0.2) == []
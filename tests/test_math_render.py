@@ -0,0 +1,79 @@
+import pytest
+
+from math_render import MathRenderCache, fit_math_image, split_math_segments
+
+# split_math_segments
+
+def test_split_inline_math():
+    assert split_math_segments("Find $x^2 + 1$ at x = 2") == [
+        ('text', 'Find '), ('inline', 'x^2 + 1'), ('text', ' at x = 2')]
+
+def test_split_display_math():
+    assert split_math_segments("$$\\frac{a}{b}$$") == [('display', '\\frac{a}{b}')]
+    assert split_math_segments("So $$ x = 2 $$ and $y$") == [
+        ('text', 'So '), ('display', 'x = 2'), ('text', ' and '), ('inline', 'y')]
+
+def test_split_escaped_dollar_signs_stay_text():
+    assert split_math_segments("It costs \\$5 and \\$10") == [('text', 'It costs $5 and $10')]
+    assert split_math_segments("\\$3 for $x$") == [('text', '$3 for '), ('inline', 'x')]
+
+@pytest.mark.parametrize('line', [
+    "costs $5 and $10 today",
+    "between $3 and $4.50",
+    "Save $ 20 now, pay $ 5 later",
+])
+def test_split_leaves_currency_as_text(line):
+    assert split_math_segments(line) == [('text', line)]
+
+def test_split_currency_next_to_math():
+    assert split_math_segments("costs $5 and $x$ more") == [
+        ('text', 'costs $5 and '), ('inline', 'x'), ('text', ' more')]
+    assert split_math_segments("pay $5, or $x + 1$") == [('text', 'pay $5, or '), ('inline', 'x + 1')]
+
+def test_split_plain_text():
+    assert split_math_segments("No math here") == [('text', 'No math here')]
+    assert split_math_segments("") == []
+
+# fit_math_image
+
+def test_fit_keeps_images_that_fit():
+    image = (b'png', 50.0, 10.0)
+    assert fit_math_image(image, 50.0) is image
+    assert fit_math_image(image, 190.0) is image
+
+def test_fit_scales_width_and_height_by_the_same_factor():
+    assert fit_math_image((b'png', 380.0, 10.0), 190.0) == (b'png', 190.0, 5.0)
+
+def test_fit_passes_through_unrendered_expressions():
+    assert fit_math_image(None, 190.0) is None
+
+# MathRenderCache
+
+def test_cache_renders_png_with_physical_size():
+    png, width, height = MathRenderCache().render("x^{2} + \\frac{1}{2}")
+    assert png.startswith(b'\x89PNG')
+    assert 0 < width < 50 and 0 < height < 20
+
+def test_cache_counts_hits_and_misses():
+    cache = MathRenderCache()
+    assert cache.hit_rate() == 0.0
+    first = cache.render("x^{2}")
+    assert cache.render("x^{2}") is first
+    assert (cache.hits, cache.misses) == (1, 1)
+    assert cache.hit_rate() == pytest.approx(0.5)
+
+def test_cache_returns_none_for_unparsable_latex():
+    cache = MathRenderCache()
+    assert cache.render("\\frac{") is None
+    # The failure is cached too, so it isn't parsed again
+    assert cache.render("\\frac{") is None
+    assert (cache.hits, cache.misses) == (1, 1)
+
+def test_cache_evicts_least_recently_used():
+    cache = MathRenderCache(max_entries=2)
+    cache.render("a")
+    cache.render("b")
+    cache.render("a")
+    cache.render("c")  # evicts "b"
+    cache.render("b")
+    assert (cache.hits, cache.misses) == (1, 4)
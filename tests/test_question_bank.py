@@ -0,0 +1,139 @@
+import pytest
+
+from question_bank import QuestionBank, compose_quiz, split_quiz_questions, subject_key
+
+KEY = ('source', 'mathematics', 'Beginner', 'Multiple Choice', '')
+
+QUESTION = ("What is the derivative of f(x) = x^3 + 2x with respect to x, "
+            "and how does the power rule apply to each term of the polynomial?")
+
+@pytest.fixture
+def bank(tmp_path):
+    return QuestionBank(str(tmp_path / 'bank.db'))
+
+# split_quiz_questions
+
+def test_split_drops_header_and_numbering():
+    quiz = "Time Limit: 10 minutes\n\n1. What is 2 + 2?\nA) 3\nB) 4\n\n2. What is 3 + 3?\nA) 6\nB) 5"
+    assert split_quiz_questions(quiz) == ["What is 2 + 2?\nA) 3\nB) 4", "What is 3 + 3?\nA) 6\nB) 5"]
+
+@pytest.mark.parametrize('first, second', [
+    ("Question 1: Define a limit.", "Question 2: Define a derivative."),
+    ("**1.** Define a limit.", "**2.** Define a derivative."),
+    ("### Question 1. Define a limit.", "### Question 2. Define a derivative."),
+    ("1) Define a limit.", "2) Define a derivative."),
+])
+def test_split_numbering_styles(first, second):
+    assert split_quiz_questions(f"{first}\n\n{second}") == ["Define a limit.", "Define a derivative."]
+
+def test_split_keeps_indented_solution_steps_in_their_question():
+    quiz = ("1. Solve 2x + 4 = 10.\n"
+            "   Solution:\n"
+            "   1. Subtract 4: 2x = 6\n"
+            "   2. Divide by 2: x = 3\n"
+            "2. Solve x - 1 = 0.")
+    questions = split_quiz_questions(quiz)
+    assert len(questions) == 2
+    assert questions[0].endswith("2. Divide by 2: x = 3")
+
+def test_split_ignores_numbers_that_break_the_sequence():
+    quiz = "1. First question\n3. not a question\n2. Second question"
+    assert split_quiz_questions(quiz) == ["First question\n3. not a question", "Second question"]
+
+@pytest.mark.parametrize('heading', [
+    "Answer Key:", "**Answer Key**", "## Answers", "Solutions:", "Answer Key (for teachers)", "Answers: 1-B, 2-A",
+])
+def test_split_ends_last_question_at_section_heading(heading):
+    quiz = f"1. What is 2 + 2?\nA) 4\nB) 5\n\n2. What is 3 + 3?\nA) 6\nB) 7\n\n{heading}\n1. A\n2. A"
+    assert split_quiz_questions(quiz) == ["What is 2 + 2?\nA) 4\nB) 5", "What is 3 + 3?\nA) 6\nB) 7"]
+    # The same heading inside a question doesn't end the quiz when the numbering continues
+    quiz = f"1. Solve 2x=4.\nA) 2\nB) 3\n{heading}\nStep 1: x=2\n\n2. Solve 3x=9.\n\n3. Solve x+1=2."
+    assert split_quiz_questions(quiz) == [f"Solve 2x=4.\nA) 2\nB) 3\n{heading}\nStep 1: x=2",
+                                          "Solve 3x=9.", "Solve x+1=2."]
+
+def test_split_keeps_answer_lines_inside_a_question():
+    quiz = ("1. Explain why the limit exists.\nAnswers may vary.\nSolution:\nStep 1: factor\n"
+            "   Answer Key: see step 1\n2. Next question")
+    questions = split_quiz_questions(quiz)
+    assert len(questions) == 2
+    assert "Answers may vary." in questions[0] and "Answer Key: see step 1" in questions[0]
+
+def test_split_without_numbered_questions():
+    assert split_quiz_questions("Here is your quiz, but in prose.") == []
+
+# subject_key
+
+@pytest.mark.parametrize('detected, expected', [
+    ("Primary Subject: **Mathematics**\nSub-discipline: Calculus\nConfidence Level: High", "mathematics"),
+    ("Primary Subject: [Physics]", "physics"),
+    ("\n\nBiology - cell structure\nmore text", "biology - cell structure"),
+    ("", "general"),
+    (None, "general"),
+])
+def test_subject_key(detected, expected):
+    assert subject_key(detected) == expected
+
+def test_subject_key_is_bounded():
+    assert len(subject_key("Primary Subject: " + "x" * 500)) == 100
+
+# source_subject
+
+def test_source_subject_reuses_first_detected_subject(bank):
+    assert bank.source_subject('source', "Primary Subject: Mathematics") == 'mathematics'
+    assert bank.source_subject('source', "Primary Subject: Mathematics (Calculus)") == 'mathematics'
+    assert bank.source_subject('other', "Primary Subject: Physics") == 'physics'
+
+def test_source_subject_is_shared_across_instances(bank):
+    bank.source_subject('source', "Primary Subject: Mathematics")
+    assert QuestionBank(bank.path).source_subject('source', "Primary Subject: Calculus") == 'mathematics'
+
+def test_source_subject_does_not_store_failed_detection(bank):
+    assert bank.source_subject('source', None) == 'general'
+    assert bank.source_subject('source', "Primary Subject: Chemistry") == 'chemistry'
+    assert bank.source_subject('source', None) == 'chemistry'
+
+# MinHash near-duplicate detection
+
+def test_signature_is_deterministic_across_instances(bank, tmp_path):
+    other = QuestionBank(str(tmp_path / 'other.db'))
+    assert bank.signature(QUESTION) == other.signature(QUESTION)
+    assert QuestionBank.similarity(bank.signature(QUESTION), bank.signature(QUESTION)) == 1.0
+
+def test_similarity_separates_paraphrase_from_different_question(bank):
+    near = bank.signature(QUESTION.replace("f(x)", "g(x)"))
+    different = bank.signature("Which of the following cell organelles is responsible for producing ATP "
+                               "through cellular respiration in eukaryotic cells?")
+    assert QuestionBank.similarity(bank.signature(QUESTION), near) >= QuestionBank.SIMILARITY_THRESHOLD
+    assert QuestionBank.similarity(bank.signature(QUESTION), different) < 0.2
+
+def test_add_skips_near_duplicates_of_stored_questions(bank):
+    assert bank.add(*KEY, [QUESTION]) == [QUESTION]
+    assert bank.add(*KEY, [QUESTION + " Show your work.", QUESTION.upper()]) == []
+    assert bank.fetch(*KEY, limit=10) == [QUESTION]
+
+def test_add_skips_duplicates_within_a_batch_and_of_existing(bank):
+    other = "State the fundamental theorem of calculus and explain how it links integrals to antiderivatives."
+    assert bank.add(*KEY, [QUESTION, QUESTION, other]) == [QUESTION, other]
+    third = "Find the area under y = x^2 between x = 0 and x = 3 using a definite integral."
+    assert bank.add(*KEY, [third], existing=[third]) == []
+
+def test_duplicate_check_is_scoped_to_the_bank_key(bank):
+    advanced = ('source', 'mathematics', 'Advanced', 'Multiple Choice', '')
+    assert bank.add(*KEY, [QUESTION]) == [QUESTION]
+    assert bank.add(*advanced, [QUESTION]) == [QUESTION]
+    assert bank.fetch(*advanced, limit=10) == [QUESTION]
+    assert bank.fetch('other source', 'mathematics', 'Beginner', 'Multiple Choice', '', limit=10) == []
+
+def test_fetch_respects_limit(bank):
+    questions = [f"Question about topic {i}: " + " ".join(f"word{i}_{j}" for j in range(12)) for i in range(5)]
+    assert bank.add(*KEY, questions) == questions
+    fetched = bank.fetch(*KEY, limit=3)
+    assert len(fetched) == 3 and set(fetched) <= set(questions)
+
+# compose_quiz
+
+def test_compose_quiz_numbers_questions_and_rounds_time_limit():
+    quiz = compose_quiz(["Q one", "Q two", "Q three"], "Advanced", "Problem Solving")
+    # 3 questions x 5 minutes x 1.5, rounded up to 25 minutes
+    assert quiz == "Time Limit: 25 minutes\n\n1. Q one\n\n2. Q two\n\n3. Q three"
+    assert split_quiz_questions(quiz) == ["Q one", "Q two", "Q three"]